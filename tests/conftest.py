@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 应用模块以脚本目录为根互相导入 (见 main.py)，测试时同样把该目录加入路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "whisper_subtitle_app"))
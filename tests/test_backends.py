@@ -0,0 +1,99 @@
+import pytest
+
+import backends
+from backends import FakeBackend, StableTsBackend, WhisperBackend, _backend_candidates, run_with_backend
+
+class FailingLoadBackend(FakeBackend):
+    name = 'failing-load'
+
+    def load(self):
+        raise RuntimeError("weights missing")
+
+class FailingJobBackend(FakeBackend):
+    name = 'failing-job'
+
+    def transcribe(self, audio_path, language=None, word_timestamps=False):
+        raise RuntimeError("decoder crashed")
+
+class BadInputBackend(FakeBackend):
+    name = 'bad-input'
+
+    def transcribe(self, audio_path, language=None, word_timestamps=False):
+        raise FileNotFoundError(audio_path)
+
+@pytest.fixture
+def installed(monkeypatch):
+    """假装 stable-ts 和 whisper 都已安装"""
+    monkeypatch.setattr(StableTsBackend, "is_available", classmethod(lambda cls: True))
+    monkeypatch.setattr(WhisperBackend, "is_available", classmethod(lambda cls: True))
+
+@pytest.fixture
+def register(monkeypatch):
+    """注册测试用后端，并把它们设为 'auto' 模式的候选顺序"""
+    def register(*backend_classes):
+        for backend_cls in backend_classes:
+            monkeypatch.setitem(backends.BACKENDS, backend_cls.name, backend_cls)
+        monkeypatch.setattr(backends, "AUTO_BACKEND_ORDER", [backend_cls.name for backend_cls in backend_classes])
+    return register
+
+def transcribe_job(backend):
+    return backend.name, backend.transcribe("missing.mp3")
+
+def test_auto_candidates_follow_priority_order(installed):
+    assert _backend_candidates('auto', True, ()) == (['stable-ts', 'whisper'], [])
+
+def test_auto_without_fallback_uses_only_first_candidate(installed):
+    assert _backend_candidates('auto', False, ()) == (['stable-ts'], [])
+
+def test_named_backend_falls_back_to_auto_order(installed):
+    assert _backend_candidates('whisper', True, ()) == (['whisper', 'stable-ts'], [])
+    assert _backend_candidates('fake', True, ()) == (['fake', 'stable-ts', 'whisper'], [])
+
+def test_named_backend_without_fallback(installed):
+    assert _backend_candidates('fake', False, ()) == (['fake'], [])
+
+def test_translation_requirement_excludes_stable_ts(installed):
+    candidates, errors = _backend_candidates('auto', True, ('translation',))
+
+    assert candidates == ['whisper']
+    assert errors == ['stable-ts: 不支持 translation']
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        _backend_candidates('missing', True, ())
+
+def test_failed_load_and_failed_job_fall_back_to_next_backend(register):
+    register(FailingLoadBackend, FailingJobBackend, FakeBackend)
+
+    name, result = run_with_backend(transcribe_job)
+
+    assert name == 'fake'
+    assert result['segments']
+
+def test_no_fallback_stops_after_first_failure(register):
+    register(FailingJobBackend, FakeBackend)
+
+    with pytest.raises(RuntimeError, match="failing-job: decoder crashed"):
+        run_with_backend(transcribe_job, fallback=False)
+
+def test_input_errors_are_not_retried_on_other_backends(register):
+    register(BadInputBackend, FakeBackend)
+
+    with pytest.raises(FileNotFoundError):
+        run_with_backend(transcribe_job)
+
+def test_error_names_every_excluded_backend(register, monkeypatch):
+    register(FailingLoadBackend, FailingJobBackend)
+    monkeypatch.setattr(StableTsBackend, "is_available", classmethod(lambda cls: False))
+    monkeypatch.setattr(backends, "AUTO_BACKEND_ORDER", ['stable-ts', 'whisper', 'failing-load', 'failing-job'])
+    monkeypatch.setattr(WhisperBackend, "is_available", classmethod(lambda cls: True))
+    monkeypatch.setattr(WhisperBackend, "capabilities", dict(WhisperBackend.capabilities, translation=False))
+
+    with pytest.raises(RuntimeError) as excinfo:
+        run_with_backend(transcribe_job, required=('translation',))
+
+    message = str(excinfo.value)
+    assert "stable-ts: 未安装" in message
+    assert "whisper: 不支持 translation" in message
+    assert "failing-load: weights missing" in message
+    assert "failing-job: decoder crashed" in message
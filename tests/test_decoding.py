@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backends import TIME_PRECISION, WhisperBackend, _split_at_last_timestamp, _tokens_to_segments
+
+TIMESTAMP_BEGIN = 1000
+
+class StubTokenizer:
+    """只实现解码流程用到的部分：文本token解码为空格分隔的单词"""
+    timestamp_begin = TIMESTAMP_BEGIN
+    vocabulary = {1: "hello", 2: "world", 3: "again", 11: "one", 12: "two", 13: "three"}
+
+    def decode(self, tokens):
+        return " ".join(self.vocabulary[token] for token in tokens)
+
+def ts(seconds):
+    return TIMESTAMP_BEGIN + round(seconds / TIME_PRECISION)
+
+def test_tokens_to_segments_splits_on_timestamp_pairs():
+    tokens = [ts(0.0), 1, ts(1.0), ts(1.0), 2, 3, ts(2.5)]
+    segments = _tokens_to_segments(tokens, StubTokenizer(), time_offset=30.0, window_duration=30.0)
+
+    assert [(s.start, s.end, s.text) for s in segments] == [
+        (30.0, 31.0, "hello"),
+        (31.0, pytest.approx(32.5), "world again"),
+    ]
+
+def test_tokens_to_segments_closes_trailing_text_at_window_end():
+    segments = _tokens_to_segments([ts(2.0), 1], StubTokenizer(), time_offset=0.0, window_duration=5.0)
+
+    assert [(s.start, s.end, s.text) for s in segments] == [(2.0, 5.0, "hello")]
+
+def test_tokens_to_segments_drops_segments_past_window():
+    tokens = [ts(0.0), 1, ts(1.0), ts(4.0), 2, ts(5.0)]
+    segments = _tokens_to_segments(tokens, StubTokenizer(), time_offset=0.0, window_duration=3.0)
+
+    assert [s.text for s in segments] == ["hello"]
+
+def test_split_at_last_timestamp_cuts_truncated_segment():
+    tokens = [ts(0.0), 1, ts(1.0), ts(1.0), 2]
+    kept, last_timestamp = _split_at_last_timestamp(tokens, TIMESTAMP_BEGIN)
+
+    assert kept == [ts(0.0), 1, ts(1.0)]
+    assert last_timestamp == pytest.approx(1.0)
+
+def test_split_at_last_timestamp_keeps_single_timestamp_ending():
+    tokens = [ts(0.0), 1, ts(1.0), ts(1.0), 2, ts(2.0)]
+
+    assert _split_at_last_timestamp(tokens, TIMESTAMP_BEGIN) == (tokens, None)
+
+class StubDecodingBackend(WhisperBackend):
+    """
+    以预设的解码结果代替模型：50秒音频，第一个窗口的转录在26秒处被截断，
+    翻译中 20–29 秒的片段跨越了截断点。
+    """
+    decode_results = {
+        (0, "transcribe"): [ts(0), 1, ts(10), ts(10), 2, ts(26), ts(26), 3],
+        (0, "translate"): [ts(0), 11, ts(20), ts(20), 12, ts(29)],
+        (2600, "transcribe"): [ts(0), 3, ts(24)],
+        (2600, "translate"): [ts(0), 12, ts(3), ts(3), 13, ts(24)],
+    }
+
+    def __init__(self):
+        super().__init__(device="cpu")
+        self.prompts = {}
+
+    def _prepare_audio(self, audio_path):
+        # 编码器特征直接用窗口起点代替，供 _decode_with_fallback 查表
+        return 5000, lambda seek, segment_size: seek
+
+    def _get_tokenizer(self, language, task):
+        return StubTokenizer()
+
+    def _decode_with_fallback(self, audio_features, task, prompt, **options):
+        self.prompts[(audio_features, task)] = list(prompt)
+        return SimpleNamespace(
+            tokens=self.decode_results[(audio_features, task)],
+            language="zh",
+            no_speech_prob=0.0,
+            avg_logprob=-0.1,
+            temperature=0.0,
+        )
+
+def test_decode_windows_does_not_repeat_translation_across_windows():
+    backend = StubDecodingBackend()
+    windows = [segments for _, segments in backend._decode_windows("audio.wav", tasks=("transcribe", "translate"))]
+
+    assert [[s.text for s in window["transcribe"]] for window in windows] == [["hello", "world"], ["again"]]
+    assert [[s.text for s in window["translate"]] for window in windows] == [["one"], ["two", "three"]]
+    # 第二个窗口从截断点开始
+    assert windows[1]["transcribe"][0].start == pytest.approx(26.0)
+    # 被丢弃的翻译片段不会进入下一个窗口的提示
+    assert 12 not in backend.prompts[(2600, "translate")]
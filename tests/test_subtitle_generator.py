@@ -0,0 +1,29 @@
+import os
+import wave
+
+import pytest
+
+pytest.importorskip("ffmpeg")
+pytest.importorskip("pysrt")
+
+from subtitle_generator import process_file
+
+def write_silent_wav(path, seconds=5, sample_rate=16000):
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b"\0\0" * sample_rate * seconds)
+
+def test_process_file_with_fake_backend_writes_both_tracks(tmp_path):
+    audio_path = tmp_path / "sample.wav"
+    write_silent_wav(audio_path)
+
+    assert process_file(str(audio_path), str(tmp_path), translate=True, backend="fake", fallback=False)
+
+    original = (tmp_path / "sample.srt").read_text(encoding="utf-8")
+    translation = (tmp_path / "sample.en.srt").read_text(encoding="utf-8")
+    assert "片段 1" in original
+    assert "Segment 1" in translation
+    assert "00:00:04,000 --> 00:00:05,000" in original
+    assert "00:00:04,000 --> 00:00:05,000" in translation
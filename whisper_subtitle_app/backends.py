@@ -0,0 +1,562 @@
+"""
+语音识别推理后端
+
+所有后端实现同一套接口（加载、批量/流式转录、双输出转录翻译），
+并统一返回 Segment 列表，便于 subtitle_generator 在不同引擎之间切换。
+"""
+import os
+import wave
+from dataclasses import dataclass, field
+
+# 尝试导入 whisper 库
+try:
+    import whisper
+    WHISPER_AVAILABLE = True
+except ImportError:
+    WHISPER_AVAILABLE = False
+
+# 尝试导入 stable-ts 库
+try:
+    import stable_whisper
+    STABLE_TS_AVAILABLE = True
+except ImportError:
+    STABLE_TS_AVAILABLE = False
+
+# Whisper 的时间戳精度 (秒)，每个时间戳token对应 0.02 秒
+TIME_PRECISION = 0.02
+
+# 与 whisper.audio 一致：每个窗口 3000 帧 (30秒)，每秒 100 帧
+N_FRAMES = 3000
+FRAMES_PER_SECOND = 100
+
+# 与 whisper.transcribe 默认值一致的解码回退与静音判断阈值
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+@dataclass
+class Segment:
+    """统一的字幕片段类型，时间单位为秒"""
+    start: float
+    end: float
+    text: str
+    words: list = field(default_factory=list) # 单词级时间戳，每项为包含 word/start/end 的字典
+
+    @classmethod
+    def from_dict(cls, segment):
+        """从 whisper / stable-ts 结果中的segment字典构造"""
+        words = [
+            {'word': word['word'], 'start': word['start'], 'end': word['end']}
+            for word in segment.get('words') or []
+        ]
+        return cls(start=segment['start'], end=segment['end'], text=segment['text'], words=words)
+
+def make_result(segments, language=None):
+    """将Segment列表包装为与原Whisper结果形状一致的字典"""
+    text = "".join(f" {segment.text.strip()}" for segment in segments)
+    return {'text': text, 'segments': segments, 'language': language}
+
+class InferenceBackend:
+    """
+    推理后端基类
+    子类需要实现 load / transcribe / transcribe_stream，
+    支持双输出模式的子类还需实现 transcribe_and_translate。
+    """
+    name = None
+    # 能力标记
+    capabilities = {
+        'word_timestamps': False, # 单词级时间戳
+        'vad': False,             # 语音活动检测
+        'batching': False,        # 原生批量推理
+        'streaming': False,       # 逐窗口流式输出
+        'translation': False,     # 双输出模式 (转录 + 英文翻译)
+    }
+
+    def __init__(self, model_size='base', device=None):
+        self.model_size = model_size
+        self.device = device
+        self.model = None
+
+    @classmethod
+    def is_available(cls):
+        """后端依赖的库是否已安装"""
+        return True
+
+    @classmethod
+    def supports(cls, capability):
+        """判断后端是否具备某项能力"""
+        return cls.capabilities.get(capability, False)
+
+    def load(self):
+        """加载模型"""
+        raise NotImplementedError
+
+    def transcribe(self, audio_path, language=None, word_timestamps=False):
+        """
+        转录整段音频
+        :return: 包含 text / segments (Segment列表) / language 的字典
+        """
+        raise NotImplementedError
+
+    def transcribe_stream(self, audio_path, language=None):
+        """逐个产出转录得到的Segment"""
+        raise NotImplementedError
+
+    def transcribe_batch(self, audio_paths, language=None, word_timestamps=False):
+        """转录多个音频文件，默认逐个处理"""
+        return [self.transcribe(path, language=language, word_timestamps=word_timestamps) for path in audio_paths]
+
+    def transcribe_and_translate(self, audio_path, language=None):
+        """
+        双输出模式
+        :return: (原文结果字典, 英文翻译结果字典)
+        """
+        raise NotImplementedError
+
+def _tokens_to_segments(tokens, tokenizer, time_offset, window_duration):
+    """
+    将一次解码得到的token序列按时间戳token切分为Segment
+    :param tokens: 解码结果中的token列表 (不含起始序列和结束符)
+    :param tokenizer: 与解码任务对应的Whisper tokenizer
+    :param time_offset: 当前窗口在整段音频中的起始时间 (秒)
+    :param window_duration: 当前窗口的有效时长 (秒)，用于闭合没有结束时间戳的片段
+    :return: Segment列表
+    """
+    segments = []
+    start = None
+    text_tokens = []
+
+    def close_segment(end):
+        text = tokenizer.decode(text_tokens).strip()
+        # 起点已超出窗口有效时长的片段属于下一个窗口，丢弃
+        if text and (start or 0.0) < window_duration:
+            seg_start = min(start or 0.0, window_duration)
+            seg_end = max(min(end, window_duration), seg_start)
+            segments.append(Segment(start=time_offset + seg_start, end=time_offset + seg_end, text=text))
+
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            timestamp = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                # 文本之后的时间戳表示当前片段结束
+                close_segment(timestamp)
+                text_tokens = []
+                start = None
+            else:
+                start = timestamp
+        else:
+            text_tokens.append(token)
+
+    # 窗口末尾没有结束时间戳的文本，以窗口结束时间闭合
+    if text_tokens:
+        close_segment(window_duration)
+    return segments
+
+def _split_at_last_timestamp(tokens, timestamp_begin):
+    """
+    按 whisper.transcribe 的规则决定下一个窗口从哪里开始。
+    如果输出不是以单个时间戳结尾，说明最后一个片段被窗口截断，
+    此时只保留到最后一对连续时间戳为止的token，下一个窗口从该时间戳重新开始。
+    :param tokens: 解码结果中的token列表
+    :param timestamp_begin: tokenizer 中第一个时间戳token的编号
+    :return: (保留的token列表, 最后时间戳相对窗口起点的秒数；无需截断时为 None)
+    """
+    is_timestamp = [token >= timestamp_begin for token in tokens]
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    consecutive = [i for i in range(1, len(tokens)) if is_timestamp[i - 1] and is_timestamp[i]]
+    if not consecutive or single_timestamp_ending:
+        return tokens, None
+    last_slice = consecutive[-1]
+    return tokens[:last_slice], (tokens[last_slice - 1] - timestamp_begin) * TIME_PRECISION
+
+def _trim_to_timestamp(tokens, timestamp_begin, cut):
+    """
+    只保留结束时间不晚于 cut 的完整片段。
+    主导任务在 cut 处截断时，其余任务跨越或超出 cut 的片段由下一个窗口重新解码，
+    因此在这里整段丢弃，而不是把结束时间裁剪到 cut (否则文本会在两个窗口中重复)。
+    :param tokens: 解码结果中的token列表
+    :param timestamp_begin: tokenizer 中第一个时间戳token的编号
+    :param cut: 截断点相对窗口起点的秒数
+    :return: 保留的token列表
+    """
+    tokens, _ = _split_at_last_timestamp(tokens, timestamp_begin)
+    keep = 0
+    has_text = False
+    for i, token in enumerate(tokens):
+        if token < timestamp_begin:
+            has_text = True
+        elif has_text:
+            # 文本之后的时间戳是片段的结束时间
+            if (token - timestamp_begin) * TIME_PRECISION > cut:
+                break
+            keep = i + 1
+            has_text = False
+    return tokens[:keep]
+
+class WhisperBackend(InferenceBackend):
+    """原始 OpenAI Whisper 后端"""
+    name = 'whisper'
+    capabilities = {
+        'word_timestamps': True,
+        'vad': False,
+        'batching': False,
+        'streaming': True,
+        'translation': True,
+    }
+
+    @classmethod
+    def is_available(cls):
+        return WHISPER_AVAILABLE
+
+    def load(self):
+        import torch
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"正在使用 {self.device.upper()} 进行推理...")
+        self.model = self._load_model()
+        return self
+
+    def _load_model(self):
+        return whisper.load_model(self.model_size, device=self.device)
+
+    @property
+    def fp16(self):
+        # CPU上fp16会导致问题，在GPU (CUDA) 上默认使用fp16以提高性能
+        return self.device != "cpu"
+
+    def _transcribe_options(self, language=None, word_timestamps=False):
+        """准备转录选项"""
+        options = {
+            "task": "transcribe",
+            "verbose": False, # 不在控制台打印详细信息
+        }
+        if not self.fp16:
+            options["fp16"] = False
+        # 如果指定了语言，则添加到选项中
+        if language:
+            options["language"] = language
+        if word_timestamps:
+            options["word_timestamps"] = True
+        return options
+
+    def _run_transcribe(self, audio_path, options):
+        return self.model.transcribe(audio_path, **options)
+
+    def transcribe(self, audio_path, language=None, word_timestamps=False):
+        options = self._transcribe_options(language=language, word_timestamps=word_timestamps)
+        result = self._run_transcribe(audio_path, options)
+        segments = [Segment.from_dict(segment) for segment in result['segments']]
+        return make_result(segments, language=result.get('language', language))
+
+    def _decode_with_fallback(self, audio_features, **options):
+        """
+        与 whisper.transcribe 相同：温度为0的解码结果压缩比过高 (重复循环)
+        或平均对数概率过低时，依次提高温度重新解码
+        """
+        for temperature in TEMPERATURES:
+            result = self.model.decode(audio_features, whisper.DecodingOptions(temperature=temperature, **options))[0]
+            needs_fallback = (
+                result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < LOGPROB_THRESHOLD
+            )
+            # 静音窗口无需回退
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD:
+                needs_fallback = False
+            if not needs_fallback:
+                break
+        return result
+
+    def _prepare_audio(self, audio_path):
+        """
+        计算整段音频的梅尔频谱
+        :return: (有效帧数, 函数 embed(seek, segment_size)，返回该窗口的编码器特征)
+        """
+        import torch
+        from whisper.audio import log_mel_spectrogram, pad_or_trim, N_SAMPLES
+
+        model = self.model
+        dtype = torch.float16 if self.fp16 else torch.float32
+        mel = log_mel_spectrogram(audio_path, model.dims.n_mels, padding=N_SAMPLES)
+
+        def embed(seek, segment_size):
+            mel_segment = pad_or_trim(mel[:, seek:seek + segment_size], N_FRAMES).to(model.device).to(dtype)
+            with torch.no_grad():
+                return model.embed_audio(mel_segment.unsqueeze(0))
+
+        return mel.shape[-1] - N_FRAMES, embed
+
+    def _get_tokenizer(self, language, task):
+        from whisper.tokenizer import get_tokenizer
+        return get_tokenizer(
+            self.model.is_multilingual,
+            num_languages=self.model.num_languages,
+            language=language,
+            task=task,
+        )
+
+    def _decode_windows(self, audio_path, language=None, tasks=("transcribe",)):
+        """
+        按窗口解码，每个窗口只计算一次编码器特征，
+        再依次以 tasks 中的每个任务在同一特征上解码。
+        第一个任务作为主导：和 whisper.transcribe 一样带温度回退和前文提示解码，
+        并在最后一个片段被截断时把下一个窗口的起点移到最后的时间戳。
+        其余任务只保留在截断点之前结束的片段，因此各任务的时间轴是对齐的，且文本不会重复。
+        :return: 生成器，每个窗口产出 (语言, {任务: Segment列表})
+        """
+        content_frames, embed = self._prepare_audio(audio_path)
+
+        # 每个任务各自的前文token，用作下一窗口的提示 (condition_on_previous_text)
+        previous_tokens = {task: [] for task in tasks}
+
+        seek = 0
+        while seek < content_frames:
+            segment_size = min(N_FRAMES, content_frames - seek)
+            time_offset = seek / FRAMES_PER_SECOND
+            window_duration = segment_size / FRAMES_PER_SECOND
+
+            # 编码器只运行一次，各任务的解码共用同一份音频特征
+            audio_features = embed(seek, segment_size)
+
+            window_segments = {}
+            advance = segment_size
+            last_timestamp = None
+            for task in tasks:
+                result = self._decode_with_fallback(
+                    audio_features,
+                    task=task,
+                    language=language,
+                    fp16=self.fp16,
+                    prompt=previous_tokens[task],
+                )
+                tokenizer = self._get_tokenizer(language or result.language, task)
+                tokens = result.tokens
+
+                if not window_segments:
+                    # 静音窗口：所有任务都跳过
+                    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                        break
+                    # 锁定检测到的语言，其余任务及后续窗口不再重复检测
+                    language = language or result.language
+                    tokens, last_timestamp = _split_at_last_timestamp(tokens, tokenizer.timestamp_begin)
+                    if last_timestamp:
+                        # 最后一个片段被截断，下一个窗口从最后的时间戳开始
+                        window_duration = last_timestamp
+                        advance = round(last_timestamp * FRAMES_PER_SECOND)
+                elif last_timestamp:
+                    tokens = _trim_to_timestamp(tokens, tokenizer.timestamp_begin, last_timestamp)
+
+                window_segments[task] = _tokens_to_segments(tokens, tokenizer, time_offset, window_duration)
+                # 高温度下的输出不可靠，不再作为后续窗口的提示
+                previous_tokens[task] = [] if result.temperature > 0.5 else previous_tokens[task] + tokens
+
+            seek += advance
+            if window_segments:
+                yield language, window_segments
+
+    def transcribe_stream(self, audio_path, language=None):
+        # 逐窗口解码近似 whisper.transcribe 的规则 (截断时回退到最后时间戳、温度回退、前文提示)，
+        # 但不含单词级时间戳和幻觉/静音处理等，输出与 transcribe 相近而不完全相同
+        for _, window_segments in self._decode_windows(audio_path, language=language):
+            yield from window_segments["transcribe"]
+
+    def transcribe_and_translate(self, audio_path, language=None):
+        if not self.model.is_multilingual:
+            raise ValueError(f"模型 {self.model_size} 不支持翻译任务，无法生成英文字幕。")
+        segments = {"transcribe": [], "translate": []}
+        for language, window_segments in self._decode_windows(audio_path, language=language, tasks=("transcribe", "translate")):
+            for task, task_segments in window_segments.items():
+                segments[task].extend(task_segments)
+        return make_result(segments["transcribe"], language), make_result(segments["translate"], language)
+
+class StableTsBackend(WhisperBackend):
+    """
+    stable-ts 后端，提供更准确的时间戳。
+    stable-ts 只能整段转录，因此不支持逐窗口流式输出和共享编码器的双输出模式。
+    """
+    name = 'stable-ts'
+    capabilities = dict(WhisperBackend.capabilities, vad=True, streaming=False, translation=False)
+
+    @classmethod
+    def is_available(cls):
+        return STABLE_TS_AVAILABLE
+
+    def _load_model(self):
+        return stable_whisper.load_model(self.model_size, device=self.device)
+
+    def _transcribe_options(self, language=None, word_timestamps=False):
+        options = super()._transcribe_options(language=language, word_timestamps=word_timestamps)
+        # 为 stable-ts 添加更多参数以提高时间轴准确性
+        options.update({
+            "suppress_silence": True,  # 抑制静默段落
+            "suppress_word_ts": False,  # 不抑制单词级时间戳
+            "gap_padding": "pad",  # 间隙填充方式
+            "only_voice_freq": False,  # 仅保留语音频率
+            "vad": True,  # 使用语音活动检测
+        })
+        return options
+
+    def _run_transcribe(self, audio_path, options):
+        print(f"stable-ts 参数: {options}")
+        # stable-ts 返回的结果需要转换为字典格式
+        return self.model.transcribe(audio_path, **options).to_dict()
+
+    def transcribe_stream(self, audio_path, language=None):
+        # 不支持逐窗口输出：整段转录后再逐个产出，保证应用 stable-ts 的 VAD 和时间戳优化
+        yield from self.transcribe(audio_path, language=language)['segments']
+
+    def transcribe_and_translate(self, audio_path, language=None):
+        raise ValueError("stable-ts 后端不支持双输出模式，请使用 whisper 后端。")
+
+class FakeBackend(InferenceBackend):
+    """
+    不加载任何模型的确定性后端，用于测试和基准测试。
+    按固定间隔把音频切成片段，输出可预测的文本。
+    """
+    name = 'fake'
+    capabilities = {
+        'word_timestamps': True,
+        'vad': False,
+        'batching': False,
+        'streaming': True,
+        'translation': True,
+    }
+
+    def __init__(self, model_size='base', device=None, segment_duration=2.0, default_duration=30.0):
+        """
+        :param segment_duration: 每个片段的时长 (秒)
+        :param default_duration: 无法读取音频时长时 (非WAV文件) 使用的时长 (秒)
+        """
+        super().__init__(model_size=model_size, device=device or "cpu")
+        self.segment_duration = segment_duration
+        self.default_duration = default_duration
+
+    def load(self):
+        return self
+
+    def _duration(self, audio_path):
+        """读取WAV文件的时长，其它格式使用默认时长"""
+        if os.path.splitext(audio_path)[1].lower() == '.wav':
+            try:
+                with wave.open(audio_path, 'rb') as wav_file:
+                    return wav_file.getnframes() / wav_file.getframerate()
+            except (wave.Error, OSError):
+                pass
+        return self.default_duration
+
+    def _segments(self, audio_path, label, word_timestamps=False):
+        duration = self._duration(audio_path)
+        start = 0.0
+        index = 1
+        while start < duration:
+            end = min(start + self.segment_duration, duration)
+            text = f"{label} {index}"
+            words = []
+            if word_timestamps:
+                words = [
+                    {'word': label, 'start': start, 'end': (start + end) / 2},
+                    {'word': f" {index}", 'start': (start + end) / 2, 'end': end},
+                ]
+            yield Segment(start=start, end=end, text=text, words=words)
+            start = end
+            index += 1
+
+    def transcribe(self, audio_path, language=None, word_timestamps=False):
+        return make_result(list(self._segments(audio_path, "片段", word_timestamps)), language or "zh")
+
+    def transcribe_stream(self, audio_path, language=None):
+        yield from self._segments(audio_path, "片段")
+
+    def transcribe_and_translate(self, audio_path, language=None):
+        original = make_result(list(self._segments(audio_path, "片段")), language or "zh")
+        translation = make_result(list(self._segments(audio_path, "Segment")), language or "zh")
+        return original, translation
+
+# 可用的后端，按名称索引
+BACKENDS = {
+    'stable-ts': StableTsBackend,
+    'whisper': WhisperBackend,
+    'fake': FakeBackend,
+}
+
+# 'auto' 模式下及自动回退时依次尝试的后端
+AUTO_BACKEND_ORDER = ['stable-ts', 'whisper']
+
+def _backend_candidates(name, fallback, required):
+    """
+    按顺序列出可以尝试的后端名称
+    :return: (候选后端名称列表, 被排除的后端及原因列表)
+    """
+    if name == 'auto':
+        names = list(AUTO_BACKEND_ORDER)
+    elif name in BACKENDS:
+        names = [name]
+        if fallback:
+            names += [other for other in AUTO_BACKEND_ORDER if other != name]
+    else:
+        raise ValueError(f"未知的推理后端: {name}，可选: {', '.join(['auto'] + list(BACKENDS))}")
+
+    candidates = []
+    errors = []
+    for candidate in names:
+        backend_cls = BACKENDS[candidate]
+        if not backend_cls.is_available():
+            errors.append(f"{candidate}: 未安装")
+            continue
+        missing = [capability for capability in required if not backend_cls.supports(capability)]
+        if missing:
+            errors.append(f"{candidate}: 不支持 {', '.join(missing)}")
+            continue
+        candidates.append(candidate)
+
+    # 不回退时只尝试第一个可用的后端 ('auto' 模式下即按优先级选出的那一个)
+    if not fallback:
+        candidates = candidates[:1]
+    return candidates, errors
+
+def _release_memory():
+    """回收已释放后端占用的内存，使用CUDA时同时清空显存缓存"""
+    import gc
+    gc.collect()
+    try:
+        import torch
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+# 模型加载成功后出现这些错误，说明问题出在输入 (如音频文件无法读取) 或任务参数，
+# 换一个后端也会同样失败，因此直接抛出而不回退
+NO_FALLBACK_ERRORS = (OSError, ValueError)
+
+def run_with_backend(job, name='auto', model_size='base', device=None, fallback=True, required=()):
+    """
+    按名称选择推理后端并执行任务，后端出错时可回退到其它后端
+    :param job: 接收已加载后端实例的函数，其返回值即为本函数的返回值
+    :param name: 后端名称 ('auto', 'stable-ts', 'whisper', 'fake')
+    :param model_size: Whisper模型大小
+    :param device: 推理设备 (可选，默认自动选择)
+    :param fallback: 后端不可用、加载失败或执行任务时后端自身出错时，
+                     是否依次回退到 AUTO_BACKEND_ORDER 中的其它后端。
+                     NO_FALLBACK_ERRORS 中的错误不会触发回退。
+    :param required: 后端必须具备的能力，如 ('translation',)
+    :return: job 的返回值
+    """
+    candidates, errors = _backend_candidates(name, fallback, required)
+    for candidate in candidates:
+        backend = None
+        try:
+            print(f"正在使用 {candidate} 后端加载 {model_size} 模型...")
+            backend = BACKENDS[candidate](model_size=model_size, device=device).load()
+            print("模型加载完成。")
+            return job(backend)
+        except Exception as e:
+            if backend is not None and isinstance(e, NO_FALLBACK_ERRORS):
+                raise
+            print(f"{candidate} 后端出错: {e}")
+            errors.append(f"{candidate}: {e}")
+        # 先释放出错的后端 (异常对象已随 except 块结束而释放)，再加载下一个，避免两个模型同时占用内存
+        backend = None
+        _release_memory()
+
+    raise RuntimeError(f"没有可用的推理后端 ({'; '.join(errors)})")
@@ -8,7 +8,7 @@ class SubtitleGeneratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Whisper 字幕生成器")
-        self.root.geometry("600x550")  # 调整高度以适应新控件
+        self.root.geometry("600x620")  # 调整高度以适应新控件
         self.root.resizable(True, True)  # 允许窗口调整大小
 
         # 存储选中的文件路径
@@ -33,6 +33,9 @@ class SubtitleGeneratorApp:
         # Whisper模型大小
         self.model_sizes = ['tiny', 'base', 'small', 'medium', 'large']
 
+        # 推理后端，'auto' 优先使用 stable-ts，不可用时自动回退到原始Whisper
+        self.backends = ['auto', 'stable-ts', 'whisper']
+
         self.create_widgets()
 
     def create_widgets(self):
@@ -101,6 +104,24 @@ class SubtitleGeneratorApp:
         chars_info_label = tk.Label(config_frame, text="(默认20，0表示不启用)", font=("Arial", 8))
         chars_info_label.grid(row=2, column=1, sticky="w", padx=(100, 5), pady=5)
 
+        # 双输出模式：同时生成原文字幕和英文字幕
+        self.translate_var = tk.BooleanVar(value=False)
+        self.translate_check = tk.Checkbutton(config_frame, text="同时生成英文字幕 (.en.srt，不使用 stable-ts 优化)", variable=self.translate_var)
+        self.translate_check.grid(row=3, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        # 推理后端选择
+        backend_label = tk.Label(config_frame, text="推理后端:")
+        backend_label.grid(row=3, column=2, sticky="w", padx=5, pady=5)
+
+        self.backend_var = tk.StringVar(value="auto")
+        self.backend_menu = ttk.Combobox(config_frame, textvariable=self.backend_var, values=self.backends, state="readonly", width=10)
+        self.backend_menu.grid(row=3, column=3, sticky="w", padx=5, pady=5)
+
+        # 后端不可用或转录失败时是否自动回退到其它后端
+        self.fallback_var = tk.BooleanVar(value=True)
+        self.fallback_check = tk.Checkbutton(config_frame, text="后端出错时自动回退到其它后端", variable=self.fallback_var)
+        self.fallback_check.grid(row=4, column=2, columnspan=2, sticky="w", padx=5, pady=5)
+
         # --- 控制按钮 ---
         control_frame = tk.Frame(self.root)
         control_frame.pack(fill="x", padx=10, pady=5)
@@ -199,17 +220,20 @@ class SubtitleGeneratorApp:
         language_code = self.languages.get(selected_language_key)
         
         model_size = self.model_var.get()
+        translate = self.translate_var.get()
+        backend = self.backend_var.get()
+        fallback = self.fallback_var.get()
 
         # 在新线程中运行处理逻辑，避免阻塞GUI
         self.btn_start.config(state="disabled", text="处理中...")
         processing_thread = threading.Thread(
             target=self.process_files_thread,
-            args=(self.selected_files, output_dir, language_code, model_size, max_chars),
+            args=(self.selected_files, output_dir, language_code, model_size, max_chars, translate, backend, fallback),
             daemon=True
         )
         processing_thread.start()
 
-    def process_files_thread(self, files, output_dir, language, model_size, max_chars):
+    def process_files_thread(self, files, output_dir, language, model_size, max_chars, translate, backend, fallback):
         """在后台线程中处理文件"""
         try:
             total_files = len(files)
@@ -219,8 +243,9 @@ class SubtitleGeneratorApp:
             for i, file_path in enumerate(files):
                 self.log(f"[{i+1}/{total_files}] 正在处理: {os.path.basename(file_path)}")
                 try:
-                    # 传递 max_chars 参数
-                    if process_file(file_path, output_dir, language=language, model_size=model_size, max_chars=max_chars):
+                    # 传递 max_chars、translate、backend 和 fallback 参数
+                    if process_file(file_path, output_dir, language=language, model_size=model_size, max_chars=max_chars,
+                                    translate=translate, backend=backend, fallback=fallback):
                         self.log(f"[{i+1}/{total_files}] 成功: {os.path.basename(file_path)}")
                         success_count += 1
                     else:
@@ -1,17 +1,10 @@
 import os
-import whisper
 import ffmpeg
 import datetime
 import tempfile
 import re
 import pysrt
-
-# 尝试导入 stable-ts 库
-try:
-    import stable_whisper
-    STABLE_TS_AVAILABLE = True
-except ImportError:
-    STABLE_TS_AVAILABLE = False
+from backends import run_with_backend
 
 # 支持的音视频文件扩展名
 SUPPORTED_FORMATS = {
@@ -67,13 +60,13 @@ def seconds_to_srt_time(seconds):
     return f"{int(hours):02}:{int(minutes):02}:{int(seconds):02},{int(milliseconds):03}"
 
 def generate_srt(segments, output_srt_path):
-    """根据Whisper的segments生成SRT文件"""
+    """根据推理后端返回的Segment列表生成SRT文件"""
     try:
         with open(output_srt_path, 'w', encoding='utf-8') as f:
             for i, segment in enumerate(segments):
-                start_time = seconds_to_srt_time(segment['start'])
-                end_time = seconds_to_srt_time(segment['end'])
-                text = segment['text'].strip()
+                start_time = seconds_to_srt_time(segment.start)
+                end_time = seconds_to_srt_time(segment.end)
+                text = segment.text.strip()
                 
                 # SRT格式: 序号\n开始时间 --> 结束时间\n文本\n\n
                 f.write(f"{i+1}\n")
@@ -212,79 +205,53 @@ def split_long_lines(srt_file_path, max_chars_per_line=20):
         print(f"分割SRT文件时出错: {e}")
         return False
 
-def transcribe_audio(audio_path, language=None, model_size='base'):
+def transcribe_audio(audio_path, language=None, model_size='base', translate=False, backend='auto', fallback=True,
+                     word_timestamps=False):
     """
-    使用Whisper模型对音频进行转录
+    使用推理后端对音频进行转录
     :param audio_path: 音频文件路径
     :param language: 音频语言 (可选, 如 'zh', 'en')
     :param model_size: Whisper模型大小 ('tiny', 'base', 'small', 'medium', 'large')
-    :return: 转录结果 (包含segments的字典) 或 None
+    :param translate: 是否同时生成英文翻译 (双输出模式，编码器特征只计算一次)
+    :param backend: 推理后端 ('auto', 'stable-ts', 'whisper', 'fake')，'auto' 优先使用 stable-ts
+    :param fallback: 后端不可用或转录失败时是否自动回退到其它后端
+    :param word_timestamps: 是否生成单词级时间戳 (写入每个Segment的words，双输出模式下不生成)
+    :return: 转录结果 (包含segments的字典) 或 None；
+             双输出模式下额外包含 'translation' 键，其值为英文翻译结果 (同样包含segments)
     """
     try:
-        print(f"正在加载Whisper {model_size} 模型...")
-        # 尝试加载模型到GPU (如果可用)
-        import torch
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"正在使用 {device.upper()} 进行推理...")
-        
-        # 根据是否安装了 stable-ts 选择使用哪种方法
-        if STABLE_TS_AVAILABLE:
-            print("检测到 stable-ts，将使用优化的时间戳...")
-            model = stable_whisper.load_model(model_size, device=device)
-            using_stable_ts = True
-        else:
-            print("未检测到 stable-ts，将使用原始Whisper...")
-            model = whisper.load_model(model_size, device=device)
-            using_stable_ts = False
-        print("模型加载完成。")
+        # 只选择具备本次任务所需能力的后端
+        required = []
+        if translate:
+            required.append('translation')
+        elif word_timestamps:
+            # 双输出模式不生成单词级时间戳，无需据此筛选后端
+            required.append('word_timestamps')
 
-        # 准备转录选项
-        transcribe_options = {
-            "task": "transcribe",
-            "verbose": False, # 不在控制台打印详细信息
-        }
-        
-        # 如果是CPU或用户明确要求，或者在CPU上fp16导致问题，则禁用fp16
-        # 在GPU (CUDA) 上，默认可以使用fp16以提高性能
-        if device == "cpu":
-            transcribe_options["fp16"] = False 
-        else:
-            # 在GPU上，可以尝试启用fp16以提高性能，除非遇到兼容性问题
-            # whisper库通常能很好地处理这一点，所以我们可以不显式设置
-            pass
-            
-        # 如果指定了语言，则添加到选项中
-        if language:
-            transcribe_options["language"] = language
-            
-        # 显示使用的转录方法
-        method = "stable-ts优化版" if using_stable_ts else "原始Whisper"
-        print(f"正在使用 {method} 进行语音识别 (语言: {language or 'auto-detect'}, 设备: {device.upper()}, 模型: {model_size})...")
-        
-        # 根据是否安装了 stable-ts 选择使用哪种转录方法
-        if using_stable_ts:
-            # 为 stable-ts 添加更多参数以提高时间轴准确性
-            transcribe_options.update({
-                "suppress_silence": True,  # 抑制静默段落
-                "suppress_word_ts": False,  # 不抑制单词级时间戳
-                "gap_padding": "pad",  # 间隙填充方式
-                "only_voice_freq": False,  # 仅保留语音频率
-                "vad": True,  # 使用语音活动检测
-            })
-            print(f"stable-ts 参数: {transcribe_options}")
-            result = model.transcribe(audio_path, **transcribe_options)
-            # stable-ts 返回的结果需要转换为字典格式
-            result = result.to_dict()
-        else:
-            result = model.transcribe(audio_path, **transcribe_options)
-            
-        print(f"语音识别完成。使用的转录方法: {method}")
-        return result
+        def run(engine):
+            method = f"{engine.name} 后端"
+            if translate:
+                method += " 双输出模式 (转录 + 英文翻译)"
+            print(f"正在使用 {method} 进行语音识别 (语言: {language or 'auto-detect'}, 设备: {engine.device.upper()}, 模型: {model_size})...")
+
+            if translate:
+                # 双输出模式使用共享编码器特征的逐窗口解码，不经过 stable-ts 的转录流程
+                print("注意：双输出模式不使用 stable-ts 的语音活动检测 (VAD) 和时间戳优化，原文字幕的时间轴可能不如单独转录精确。")
+                result, translation = engine.transcribe_and_translate(audio_path, language=language)
+                result["translation"] = translation
+            else:
+                result = engine.transcribe(audio_path, language=language, word_timestamps=word_timestamps)
+
+            print(f"语音识别完成。使用的转录方法: {method}")
+            return result
+
+        return run_with_backend(run, backend, model_size=model_size, fallback=fallback, required=required)
     except Exception as e:
         print(f"语音识别时出错: {e}")
         return None
 
-def process_file(input_file_path, output_dir, language=None, model_size='base', max_chars=20):
+def process_file(input_file_path, output_dir, language=None, model_size='base', max_chars=20, translate=False,
+                 backend='auto', fallback=True):
     """
     处理单个文件（音视频）并生成SRT字幕
     :param input_file_path: 输入文件路径
@@ -292,6 +259,9 @@ def process_file(input_file_path, output_dir, language=None, model_size='base',
     :param language: 音频语言 (可选)
     :param model_size: Whisper模型大小
     :param max_chars: 每行最大字符数 (0表示不启用分割)
+    :param translate: 是否同时生成英文字幕 (输出为 name.srt 和 name.en.srt)
+    :param backend: 推理后端名称 ('auto', 'stable-ts', 'whisper', 'fake')
+    :param fallback: 后端不可用或转录失败时是否自动回退到其它后端
     :return: True if successful, False otherwise
     """
     file_type = get_file_type(input_file_path)
@@ -302,6 +272,7 @@ def process_file(input_file_path, output_dir, language=None, model_size='base',
     # 获取不带扩展名的文件名
     base_name = os.path.splitext(os.path.basename(input_file_path))[0]
     output_srt_path = os.path.join(output_dir, f"{base_name}.srt")
+    output_en_srt_path = os.path.join(output_dir, f"{base_name}.en.srt")
 
     audio_path_to_transcribe = input_file_path # 默认直接使用输入文件（如果是音频）
     
@@ -323,7 +294,8 @@ def process_file(input_file_path, output_dir, language=None, model_size='base',
         print(f"音频提取成功: {audio_path_to_transcribe}")
 
     # 进行语音识别
-    result = transcribe_audio(audio_path_to_transcribe, language=language, model_size=model_size)
+    result = transcribe_audio(audio_path_to_transcribe, language=language, model_size=model_size, translate=translate,
+                              backend=backend, fallback=fallback)
     
     # 如果是视频文件，清理临时音频文件
     if file_type == 'video' and 'tmp_audio_path' in locals():
@@ -332,21 +304,26 @@ def process_file(input_file_path, output_dir, language=None, model_size='base',
         print("临时音频文件已清理。")
         
     if result and 'segments' in result:
-        # 生成SRT文件
-        if generate_srt(result['segments'], output_srt_path):
-            print(f"成功为 {input_file_path} 生成字幕文件 {output_srt_path}")
+        # 需要生成的字幕文件：原文字幕，以及双输出模式下的英文字幕
+        outputs = [(result['segments'], output_srt_path)]
+        if translate:
+            outputs.append((result['translation']['segments'], output_en_srt_path))
+
+        for segments, srt_path in outputs:
+            # 生成SRT文件
+            if not generate_srt(segments, srt_path):
+                print(f"为 {input_file_path} 生成SRT文件失败。")
+                return False
+            print(f"成功为 {input_file_path} 生成字幕文件 {srt_path}")
             # 新增：如果设置了最大字符数，则对生成的SRT文件进行分割
             if max_chars > 0:
                 print(f"正在对字幕文件进行行分割，最大字符数: {max_chars}")
-                if split_long_lines(output_srt_path, max_chars_per_line=max_chars):
-                    print(f"字幕行分割完成: {output_srt_path}")
+                if split_long_lines(srt_path, max_chars_per_line=max_chars):
+                    print(f"字幕行分割完成: {srt_path}")
                 else:
-                    print(f"字幕行分割失败: {output_srt_path}")
+                    print(f"字幕行分割失败: {srt_path}")
                     return False
-            return True
-        else:
-            print(f"为 {input_file_path} 生成SRT文件失败。")
-            return False
+        return True
     else:
         print(f"语音识别未返回有效结果: {input_file_path}")
         return False
@@ -355,4 +332,6 @@ def process_file(input_file_path, output_dir, language=None, model_size='base',
 if __name__ == '__main__':
     # 这里可以添加一些简单的测试代码
     # 例如: process_file('test.mp4', './output', language='zh')
+    # 使用 fake 后端可以在不下载模型的情况下跑通整个流程:
+    # process_file('test.wav', './output', backend='fake', fallback=False)
     pass
\ No newline at end of file